@@ -1,10 +1,12 @@
 from aws_cdk import (
     Stack,
     SecretValue,
+    BundlingOptions,
     aws_ec2 as ec2,
     aws_dynamodb as dynamodb,
     aws_lambda as lambda_,
     aws_lambda_event_sources as lambda_events,
+    aws_applicationautoscaling as appscaling,
     aws_iam as iam,
     aws_sqs as sqs,
     aws_secretsmanager as secretsmanager,
@@ -92,11 +94,9 @@ class FirewatchStack(Stack):
             service=ec2.GatewayVpcEndpointAwsService.S3,
         )
         
-        # Add Secrets Manager VPC Endpoint (interface endpoint)
-        vpc.add_interface_endpoint(
-            "SecretsManagerEndpoint",
-            service=ec2.InterfaceVpcEndpointAwsService.SECRETS_MANAGER,
-        )
+        # No Secrets Manager interface endpoint: each Lambda container reads
+        # its secret once and caches it, so the few calls that go through
+        # the NAT Gateway cost far less than an hourly per-AZ endpoint
 
         # ============================================================
         # 3. DYNAMODB TABLE with Streams
@@ -146,19 +146,52 @@ class FirewatchStack(Stack):
         # 6. LAMBDA FUNCTIONS
         # ============================================================
         
+        # Third-party dependencies shared by all functions, pinned in
+        # layer/requirements.txt and installed as arm64 wheels
+        deps_layer = lambda_.LayerVersion(
+            self, "DependenciesLayer",
+            layer_version_name="firewatch-dependencies",
+            code=lambda_.Code.from_asset(
+                "layer",
+                bundling=BundlingOptions(
+                    image=lambda_.Runtime.PYTHON_3_12.bundling_image,
+                    command=[
+                        "bash", "-c",
+                        "pip install -r requirements.txt -t /asset-output/python "
+                        "--platform manylinux2014_aarch64 --only-binary=:all:",
+                    ],
+                ),
+            ),
+            compatible_runtimes=[lambda_.Runtime.PYTHON_3_12],
+            compatible_architectures=[lambda_.Architecture.ARM_64],
+            description="Pinned third-party dependencies for Firewatch Lambdas",
+        )
+        
+        # Handler code only, shared by all functions as a single asset
+        lambda_code = lambda_.Code.from_asset(
+            "lambda",
+            exclude=["requirements.txt", "__pycache__", "*.pyc"],
+        )
+        
         # Lambda 1: Fetch fires from NASA FIRMS API
         fetch_lambda = lambda_.Function(
             self, "FetchFiresFunction",
             function_name="firewatch-fetch-fires-api",
             runtime=lambda_.Runtime.PYTHON_3_12,
+            architecture=lambda_.Architecture.ARM_64,
             handler="fetch_fires.lambda_handler",
-            code=lambda_.Code.from_asset("lambda"),
-            vpc=vpc,
-            vpc_subnets=ec2.SubnetSelection(
-                subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS
-            ),
+            code=lambda_code,
+            layers=[deps_layer],
+            # Runs outside the VPC: it only talks to NASA FIRMS, SQS and
+            # Secrets Manager over public endpoints, so it skips ENI setup
+            # on cold start and keeps FIRMS downloads off the NAT Gateway
             timeout=Duration.minutes(2),
-            memory_size=512,
+            memory_size=256,  # FIRMS CSV is streamed, not buffered
+            # Same JSON logging as the other functions; per-message send
+            # results only at DEBUG
+            logging_format=lambda_.LoggingFormat.JSON,
+            application_log_level_v2=lambda_.ApplicationLogLevel.INFO,
+            system_log_level_v2=lambda_.SystemLogLevel.WARN,
             environment={
                 "QUEUE_URL": fire_data_queue.queue_url,
                 "FIRMS_SECRET_NAME": firms_secret.secret_name,
@@ -170,14 +203,21 @@ class FirewatchStack(Stack):
             self, "ProcessFiresFunction",
             function_name="firewatch-process-fires",
             runtime=lambda_.Runtime.PYTHON_3_12,
+            architecture=lambda_.Architecture.ARM_64,
             handler="process_fires.lambda_handler",
-            code=lambda_.Code.from_asset("lambda"),
+            code=lambda_code,
+            layers=[deps_layer],
             vpc=vpc,
             vpc_subnets=ec2.SubnetSelection(
                 subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS
             ),
             timeout=Duration.minutes(2),
             memory_size=256,
+            # JSON log lines at INFO: one summary per invocation, per-message
+            # and per-chunk detail only when the level is lowered to DEBUG
+            logging_format=lambda_.LoggingFormat.JSON,
+            application_log_level_v2=lambda_.ApplicationLogLevel.INFO,
+            system_log_level_v2=lambda_.SystemLogLevel.WARN,
             environment={
                 "DYNAMODB_TABLE_NAME": table.table_name,
                 "BIGDATA_SECRET_NAME": bigdata_secret.secret_name,
@@ -189,25 +229,76 @@ class FirewatchStack(Stack):
             self, "StreamProcessorFunction",
             function_name="firewatch-stream-processor",
             runtime=lambda_.Runtime.PYTHON_3_12,
+            architecture=lambda_.Architecture.ARM_64,
             handler="stream_processor.lambda_handler",
-            code=lambda_.Code.from_asset("lambda"),
+            code=lambda_code,
+            layers=[deps_layer],
             timeout=Duration.minutes(1),
             memory_size=128,
+            logging_format=lambda_.LoggingFormat.JSON,
+            application_log_level_v2=lambda_.ApplicationLogLevel.INFO,
+            system_log_level_v2=lambda_.SystemLogLevel.WARN,
             environment={
                 "SNS_TOPIC_ARN": fire_alerts_topic.topic_arn,
             },
         )
 
+        # Published aliases with provisioned concurrency so the scheduled
+        # fetch and the queue consumer don't pay cold starts
+        fetch_alias = fetch_lambda.add_alias(
+            "live",
+            provisioned_concurrent_executions=1,
+        )
+        
+        # No fixed provisioned concurrency here: the alias's scaling target
+        # owns it, and a hard-coded value would be reset on every deploy
+        process_alias = process_lambda.add_alias("live")
+        
+        # Declared directly rather than through add_auto_scaling, whose
+        # result only offers utilization and schedule scaling
+        process_scaling_target = appscaling.ScalableTarget(
+            self, "ProcessFiresConcurrency",
+            service_namespace=appscaling.ServiceNamespace.LAMBDA,
+            scalable_dimension="lambda:function:ProvisionedConcurrency",
+            resource_id=f"function:{process_lambda.function_name}:{process_alias.alias_name}",
+            min_capacity=1,
+            max_capacity=10,
+        )
+        process_scaling_target.node.add_dependency(process_alias)
+        
+        # Step scaling on queue depth. Each invocation takes up to 25
+        # messages, so 4 environments drain a 100-message backlog in one
+        # pass and anything larger gets the maximum; between 10 and 25
+        # visible messages the current capacity is kept
+        process_scaling_target.scale_on_metric(
+            "QueueDepthScaling",
+            metric=fire_data_queue.metric_approximate_number_of_messages_visible(
+                period=Duration.minutes(1),
+                statistic="Maximum",
+            ),
+            adjustment_type=appscaling.AdjustmentType.EXACT_CAPACITY,
+            scaling_steps=[
+                appscaling.ScalingInterval(upper=10, change=1),
+                appscaling.ScalingInterval(lower=25, upper=100, change=4),
+                appscaling.ScalingInterval(lower=100, change=10),
+            ],
+        )
+
         # ============================================================
         # 7. EVENT SOURCES & TRIGGERS
         # ============================================================
         
         # Connect SQS to processing Lambda
-        process_lambda.add_event_source(
+        process_alias.add_event_source(
             lambda_events.SqsEventSource(
                 fire_data_queue,
-                batch_size=10,  # Process 10 fires at a time
-                max_batching_window=Duration.seconds(10),
+                # Fires arrive in one burst every 15 minutes, so a batching
+                # window costs no freshness and lets each invocation take up
+                # to 25 messages (10 fires each) instead of 10
+                batch_size=25,
+                max_batching_window=Duration.seconds(20),
+                # Only failed messages are redelivered (see process_fires)
+                report_batch_item_failures=True,
             )
         )
         
@@ -217,8 +308,19 @@ class FirewatchStack(Stack):
                 table,
                 starting_position=lambda_.StartingPosition.LATEST,
                 batch_size=100,
+                # Gather the burst of inserts from one process run into a
+                # single invocation (and a single alert email)
+                max_batching_window=Duration.seconds(10),
                 bisect_batch_on_error=True,
                 retry_attempts=2,
+                # Only new fires raise alerts; MODIFY/REMOVE records are
+                # dropped by the event source mapping instead of invoking
+                # the function
+                filters=[
+                    lambda_.FilterCriteria.filter({
+                        "eventName": lambda_.FilterRule.is_equal("INSERT"),
+                    }),
+                ],
             )
         )
         
@@ -231,7 +333,7 @@ class FirewatchStack(Stack):
         )
         
         schedule_rule.add_target(
-            targets.LambdaFunction(fetch_lambda)
+            targets.LambdaFunction(fetch_alias)
         )
 
         # ============================================================
@@ -2,33 +2,97 @@
 Lambda function to fetch fire data from NASA FIRMS API
 Runs on a schedule (EventBridge) and sends data to SQS for processing
 """
+import codecs
+import csv
+import itertools
 import json
-import urllib.request
-import urllib.parse
+import logging
+import operator
 import os
 import boto3
+import urllib3
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from datetime import datetime, timedelta
+from fire_keys import make_fire_id
 
 # Initialize AWS services
 sqs = boto3.client('sqs')
 secretsmanager = boto3.client('secretsmanager')
 
+# Log level follows the function's logging config (AWS_LAMBDA_LOG_LEVEL);
+# per-message send results are DEBUG so they are dropped at INFO
+# (Lambda's TRACE has no stdlib equivalent, so it logs as DEBUG)
+logger = logging.getLogger(__name__)
+LOG_LEVEL = os.environ.get('AWS_LAMBDA_LOG_LEVEL', 'INFO')
+logger.setLevel('DEBUG' if LOG_LEVEL == 'TRACE' else LOG_LEVEL)
+
+# Pooled keep-alive HTTPS connections, reused across warm invocations
+http = urllib3.PoolManager(maxsize=10, retries=urllib3.Retry(3, backoff_factor=0.2))
+
+# orjson (optional, shipped in the dependencies layer) encodes the SQS
+# message bodies several times faster than the stdlib encoder
+try:
+    import orjson
+    
+    def json_dumps(obj):
+        return orjson.dumps(obj).decode('utf-8')
+except ImportError:
+    json_dumps = json.dumps
+
 QUEUE_URL = os.environ['QUEUE_URL']
 FIRMS_SECRET_NAME = os.environ['FIRMS_SECRET_NAME']
 
+# Comma-separated FIRMS sources, fetched concurrently
+# (e.g. "VIIRS_SNPP_NRT,VIIRS_NOAA20_NRT,MODIS_NRT"); duplicates are dropped
+FIRMS_SOURCES = list(dict.fromkeys(
+    source.strip()
+    for source in os.environ.get('FIRMS_SOURCES', 'VIIRS_SNPP_NRT').split(',')
+    if source.strip()
+))
+
+# FIRMS CSV columns extracted per fire, with defaults for absent columns
+CSV_FIELDS = (
+    ('latitude', None),
+    ('longitude', None),
+    ('brightness', 0),
+    ('confidence', 'unknown'),
+    ('frp', 0),
+    ('acq_date', ''),
+    ('acq_time', ''),
+    ('satellite', ''),
+    ('instrument', ''),
+    ('daynight', ''),
+)
+
+# SQS limit on messages per send_message_batch call
+SQS_MAX_BATCH_ENTRIES = 10
+
+# Cache for FIRMS secret (loaded once per container lifecycle)
+_secret_cache = None
+
 def lambda_handler(event, context):
     """
     Fetch active fire data from NASA FIRMS and send to SQS for processing
     """
     try:
-        print("🔥 Starting fire data fetch from NASA FIRMS...")
+        logger.info("🔥 Starting fire data fetch from NASA FIRMS...")
         
-        # Get API credentials from Secrets Manager
-        secret = get_secret(FIRMS_SECRET_NAME)
+        if not FIRMS_SOURCES:
+            logger.error("⚠️  No FIRMS sources configured. Please set FIRMS_SOURCES.")
+            return {
+                'statusCode': 400,
+                'body': json.dumps({
+                    'error': 'No FIRMS sources configured',
+                    'message': 'Set FIRMS_SOURCES to a comma-separated list of FIRMS sources'
+                })
+            }
+        
+        # Get API credentials from Secrets Manager (cached across warm invocations)
+        secret = get_firms_secret()
         map_key = secret.get('map_key')
         
         if not map_key or map_key == "YOUR_MAP_KEY_HERE":
-            print("⚠️  NASA FIRMS API key not configured. Please update the secret.")
+            logger.error("⚠️  NASA FIRMS API key not configured. Please update the secret.")
             return {
                 'statusCode': 400,
                 'body': json.dumps({
@@ -37,11 +101,15 @@ def lambda_handler(event, context):
                 })
             }
         
-        # Fetch fires from the last 24 hours
-        fires = fetch_firms_data(map_key)
+        # Stream fires from the last 24 hours into the SQS queue in batches
+        results = fetch_and_queue(map_key, FIRMS_SOURCES)
+        
+        failed_sources = [source for source, result in results.items() if 'error' in result]
+        fires_found = sum(result.get('fires_found', 0) for result in results.values())
+        sent_count = sum(result.get('fires_queued', 0) for result in results.values())
         
-        if not fires:
-            print("ℹ️  No active fires detected in the last 24 hours")
+        if not fires_found and not failed_sources:
+            logger.info("ℹ️  No active fires detected in the last 24 hours")
             return {
                 'statusCode': 200,
                 'body': json.dumps({
@@ -50,23 +118,36 @@ def lambda_handler(event, context):
                 })
             }
         
-        # Send fires to SQS queue in batches
-        sent_count = send_to_queue(fires)
+        if failed_sources:
+            logger.warning(
+                "⚠️  Sent %d fires to processing queue; %d of %d sources failed",
+                sent_count, len(failed_sources), len(results)
+            )
+        else:
+            logger.info("✅ Successfully sent %d fires to processing queue", sent_count)
         
-        print(f"✅ Successfully sent {sent_count} fires to processing queue")
+        # Fires from the sources that succeeded are already queued, so a
+        # failed source only makes the run partial (500 if none succeeded)
+        if not failed_sources:
+            status_code, message = 200, 'Fire data fetched successfully'
+        elif len(failed_sources) < len(results):
+            status_code, message = 207, f"Failed to fetch {', '.join(failed_sources)}"
+        else:
+            status_code, message = 500, 'Failed to fetch fire data'
         
         return {
-            'statusCode': 200,
+            'statusCode': status_code,
             'body': json.dumps({
-                'message': 'Fire data fetched successfully',
-                'fires_found': len(fires),
+                'message': message,
+                'fires_found': fires_found,
                 'fires_queued': sent_count,
+                'sources': results,
                 'timestamp': datetime.now().isoformat()
             })
         }
         
     except Exception as e:
-        print(f"❌ Error fetching fire data: {str(e)}")
+        logger.exception("❌ Error fetching fire data: %s", e)
         return {
             'statusCode': 500,
             'body': json.dumps({
@@ -75,146 +156,300 @@ def lambda_handler(event, context):
             })
         }
 
+def get_firms_secret():
+    """Return the FIRMS secret, fetching it from Secrets Manager on first use"""
+    global _secret_cache
+    
+    if _secret_cache is None:
+        secret = get_secret(FIRMS_SECRET_NAME)
+        # Don't cache failed lookups so the next invocation retries
+        if not secret.get('map_key'):
+            return secret
+        _secret_cache = secret
+    
+    return _secret_cache
+
 def get_secret(secret_name):
     """Retrieve secret from AWS Secrets Manager"""
     try:
         response = secretsmanager.get_secret_value(SecretId=secret_name)
         return json.loads(response['SecretString'])
     except Exception as e:
-        print(f"Error retrieving secret: {str(e)}")
+        logger.error("Error retrieving secret: %s", e)
         return {}
 
+def fetch_and_queue(map_key, sources):
+    """
+    Fetch several FIRMS sources concurrently and stream each one to SQS
+    
+    Args:
+        map_key: NASA FIRMS API key
+        sources: FIRMS data sources to fetch
+    
+    Each source succeeds or fails on its own: an error in one source is
+    recorded against it and does not discard the results of the others.
+    
+    Returns:
+        dict: Outcome per source, either {'fires_found', 'fires_queued'}
+        or {'error'}
+    
+    Raises:
+        ValueError: If no sources are given
+    """
+    if not sources:
+        raise ValueError("No FIRMS sources to fetch")
+    
+    results = {}
+    
+    with ThreadPoolExecutor(max_workers=len(sources)) as executor:
+        futures = {
+            executor.submit(
+                lambda source: send_to_queue(
+                    fetch_firms_data(map_key, source=source),
+                    batch_prefix=source
+                ),
+                source
+            ): source
+            for source in sources
+        }
+        
+        for future in as_completed(futures):
+            source = futures[future]
+            try:
+                fires_found, sent_count = future.result()
+            except Exception as e:
+                logger.error("❌ Error fetching %s: %s", source, e)
+                results[source] = {'error': str(e)}
+                continue
+            
+            results[source] = {'fires_found': fires_found, 'fires_queued': sent_count}
+    
+    return results
+
 def fetch_firms_data(map_key, source='VIIRS_SNPP_NRT', area='world', day_range=1):
     """
     Fetch fire data from NASA FIRMS API
     
+    The CSV response is parsed as it streams in, so the full payload is
+    never held in memory.
+    
     Args:
         map_key: NASA FIRMS API key
         source: Data source (VIIRS_SNPP_NRT, VIIRS_NOAA20_NRT, MODIS_NRT)
         area: Geographic area (world, USA, etc.)
         day_range: Number of days to fetch (1, 7, etc.)
     
-    Returns:
-        List of fire records
+    Yields:
+        Fire records
     """
     # NASA FIRMS API endpoint
     # Format: https://firms.modaps.eosdis.nasa.gov/api/area/csv/MAP_KEY/SOURCE/AREA/DAY_RANGE
     base_url = "https://firms.modaps.eosdis.nasa.gov/api/area/csv"
     url = f"{base_url}/{map_key}/{source}/{area}/{day_range}"
     
-    print(f"📡 Fetching from: {url}")
+    # The URL embeds the map key, so only the source is logged
+    logger.info("📡 Fetching %s from NASA FIRMS", source)
     
     try:
-        with urllib.request.urlopen(url, timeout=30) as response:
-            data = response.read().decode('utf-8')
-            
-            # Parse CSV data
-            fires = parse_csv_data(data)
-            print(f"📊 Parsed {len(fires)} fire records")
+        response = http.request('GET', url, timeout=30.0, preload_content=False)
+        
+        try:
+            if response.status == 404:
+                logger.info("ℹ️  No fire data available for %s (404)", source)
+                return
+            if response.status != 200:
+                logger.error("HTTP Error %s: %s", response.status, response.reason)
+                raise urllib3.exceptions.HTTPError(f"FIRMS request failed with HTTP {response.status}")
             
-            return fires
+            # Parse CSV data line by line as it is downloaded
+            fire_count = 0
+            for fire in parse_csv_data(codecs.iterdecode(response, 'utf-8')):
+                fire_count += 1
+                yield fire
             
-    except urllib.error.HTTPError as e:
-        if e.code == 404:
-            print("ℹ️  No fire data available (404)")
-            return []
-        else:
-            print(f"HTTP Error {e.code}: {e.reason}")
-            raise
+            logger.info("📊 Parsed %d %s fire records", fire_count, source)
+        finally:
+            response.release_conn()
+        
     except Exception as e:
-        print(f"Error fetching FIRMS data: {str(e)}")
+        logger.error("Error fetching FIRMS data: %s", e)
         raise
 
-def parse_csv_data(csv_data):
+def parse_csv_data(csv_lines):
     """
     Parse CSV fire data from FIRMS
     
     CSV Format:
     latitude,longitude,brightness,scan,track,acq_date,acq_time,satellite,
     instrument,confidence,version,bright_t31,frp,daynight
+    
+    Column positions are resolved once from the header, so each row is
+    unpacked with a single itemgetter call instead of building a dict.
+    
+    Args:
+        csv_lines: Iterable of CSV text lines
+    
+    Yields:
+        Fire records
     """
-    fires = []
-    lines = csv_data.strip().split('\n')
+    reader = csv.reader(csv_lines)
+    header = next(reader, None)
+    if not header:
+        return
     
-    if len(lines) < 2:
-        return fires
+    width = len(header)
+    positions = {name: index for index, name in enumerate(header)}
+    if 'latitude' not in positions or 'longitude' not in positions:
+        logger.error("Error parsing FIRMS CSV: no coordinate columns in header %s", header)
+        return
     
-    # Parse header
-    header = lines[0].split(',')
+    # Absent optional columns are appended to each row as their defaults
+    indexes = []
+    defaults = []
+    for name, default in CSV_FIELDS:
+        if name in positions:
+            indexes.append(positions[name])
+        else:
+            indexes.append(width + len(defaults))
+            defaults.append(default)
+    extract = operator.itemgetter(*indexes)
     
     # Parse data rows
-    for line in lines[1:]:
-        values = line.split(',')
-        if len(values) < len(header):
+    for row in reader:
+        if not row:
+            continue
+        if len(row) < width:
+            logger.warning("Error parsing fire record: expected %d columns, got %d", width, len(row))
             continue
         
+        row[width:] = defaults
+        (latitude, longitude, brightness, confidence, frp,
+         acq_date, acq_time, satellite, instrument, daynight) = extract(row)
+        
         try:
-            fire = dict(zip(header, values))
-            
             # Extract key fields
             fire_record = {
-                'latitude': float(fire.get('latitude', 0)),
-                'longitude': float(fire.get('longitude', 0)),
-                'brightness': float(fire.get('brightness', 0)),
-                'confidence': fire.get('confidence', 'unknown'),
-                'frp': float(fire.get('frp', 0)),  # Fire Radiative Power
-                'acq_date': fire.get('acq_date', ''),
-                'acq_time': fire.get('acq_time', ''),
-                'satellite': fire.get('satellite', ''),
-                'instrument': fire.get('instrument', ''),
-                'daynight': fire.get('daynight', ''),
+                'latitude': float(latitude),
+                'longitude': float(longitude),
+                'brightness': float(brightness),
+                'confidence': confidence,
+                'frp': float(frp),  # Fire Radiative Power
+                'acq_date': acq_date,
+                'acq_time': acq_time,
+                'satellite': satellite,
+                'instrument': instrument,
+                'daynight': daynight,
             }
             
-            fires.append(fire_record)
-            
-        except (ValueError, KeyError) as e:
-            print(f"Error parsing fire record: {str(e)}")
+        except ValueError as e:
+            logger.warning("Error parsing fire record: %s", e)
             continue
-    
-    return fires
+        
+        # Key the process Lambda stores the fire under, computed once here
+        # at ingest
+        fire_record['fire_id'] = make_fire_id(fire_record['latitude'], fire_record['longitude'], acq_date, acq_time)
+        
+        yield fire_record
 
-def send_to_queue(fires, batch_size=10):
+def send_to_queue(fires, batch_size=10, max_workers=10, batch_prefix='batch'):
     """
     Send fire records to SQS queue in batches
     
+    Fires are consumed lazily and packed into send_message_batch calls (up
+    to 10 messages per call). Calls are issued concurrently, with at most
+    max_workers in flight so only a bounded number of fires is buffered.
+    
     Args:
-        fires: List of fire records
+        fires: Iterable of fire records
         batch_size: Number of records per SQS message (max 10)
+        max_workers: Maximum number of concurrent send_message_batch calls
+        batch_prefix: Prefix for batch ids (e.g. the FIRMS source)
     
     Returns:
-        Number of fires successfully queued
+        Tuple of (fires read, fires successfully queued)
     """
+    total_count = 0
     sent_count = 0
+    timestamp = datetime.now().isoformat()
     
-    # Split fires into batches
-    for i in range(0, len(fires), batch_size):
-        batch = fires[i:i + batch_size]
+    fires = iter(fires)
+    batch_sizes = {}
+    batch_number = 0
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
         
-        try:
-            # Send batch to SQS
-            message = {
-                'fires': batch,
-                'batch_id': f"batch_{i//batch_size}",
-                'timestamp': datetime.now().isoformat()
-            }
-            
-            response = sqs.send_message(
-                QueueUrl=QUEUE_URL,
-                MessageBody=json.dumps(message),
-                MessageAttributes={
-                    'batch_size': {
-                        'StringValue': str(len(batch)),
-                        'DataType': 'Number'
-                    }
+        while True:
+            # Build one send_message_batch request of up to 10 messages
+            entries = []
+            while len(entries) < SQS_MAX_BATCH_ENTRIES:
+                batch = list(itertools.islice(fires, batch_size))
+                if not batch:
+                    break
+                
+                message = {
+                    'fires': batch,
+                    'batch_id': f"{batch_prefix}_{batch_number}",
+                    'timestamp': timestamp
                 }
-            )
+                
+                entries.append({
+                    'Id': str(batch_number),
+                    'MessageBody': json_dumps(message),
+                    'MessageAttributes': {
+                        'batch_size': {
+                            'StringValue': str(len(batch)),
+                            'DataType': 'Number'
+                        }
+                    }
+                })
+                batch_sizes[str(batch_number)] = len(batch)
+                total_count += len(batch)
+                batch_number += 1
             
-            sent_count += len(batch)
-            print(f"✉️  Sent batch {i//batch_size}: {len(batch)} fires (MessageId: {response['MessageId']})")
+            if not entries:
+                break
             
-        except Exception as e:
-            print(f"Error sending batch to queue: {str(e)}")
-            continue
+            # Wait for a slot before reading more fires off the stream
+            if len(pending) >= max_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                sent_count += sum(count_queued_fires(future, batch_sizes) for future in done)
+            
+            pending.add(executor.submit(
+                sqs.send_message_batch,
+                QueueUrl=QUEUE_URL,
+                Entries=entries
+            ))
+        
+        for future in as_completed(pending):
+            sent_count += count_queued_fires(future, batch_sizes)
     
-    return sent_count
+    return total_count, sent_count
 
+def count_queued_fires(future, batch_sizes):
+    """
+    Log the result of a send_message_batch call (successes at DEBUG)
+    
+    Args:
+        future: Future for the send_message_batch call
+        batch_sizes: Number of fires in each message, keyed by entry Id
+    
+    Returns:
+        Number of fires successfully queued by the call
+    """
+    try:
+        response = future.result()
+    except Exception as e:
+        logger.error("Error sending batch to queue: %s", e)
+        return 0
+    
+    queued = 0
+    
+    for success in response.get('Successful', []):
+        queued += batch_sizes[success['Id']]
+        logger.debug("✉️  Sent batch %s: %d fires (MessageId: %s)", success['Id'], batch_sizes[success['Id']], success['MessageId'])
+    
+    for failure in response.get('Failed', []):
+        logger.error("Error sending batch %s to queue: %s", failure['Id'], failure.get('Message', failure['Code']))
+    
+    return queued
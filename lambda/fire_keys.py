@@ -0,0 +1,22 @@
+"""
+Key shared by every writer of the fire data table
+"""
+
+def make_fire_id(latitude, longitude, acq_date, acq_time):
+    """
+    Build the DynamoDB key for a fire detection
+    
+    Same detection -> same key, so overlapping fetches and redeliveries
+    overwrite the existing item instead of adding a duplicate. Never
+    derived from the clock, which would make every retry a new fire.
+    
+    Args:
+        latitude: Detection latitude
+        longitude: Detection longitude
+        acq_date: Acquisition date (YYYY-MM-DD)
+        acq_time: Acquisition time (HHMM)
+    
+    Returns:
+        str: fire_id, e.g. "34.0522_-118.2437_2024-01-15_0130"
+    """
+    return f"{latitude}_{longitude}_{acq_date}_{acq_time}"
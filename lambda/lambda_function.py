@@ -1,19 +1,49 @@
+import functools
 import json
-import urllib.request
 import urllib.parse
 from datetime import datetime
 import boto3
+from botocore.config import Config
+import urllib3
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
+from fire_keys import make_fire_id
 import os
 
 # Initialize AWS services
-dynamodb = boto3.resource('dynamodb')
+# Adaptive retries back off on throttling; batch_writer resubmits
+# unprocessed items itself
+dynamodb = boto3.resource('dynamodb', config=Config(retries={'max_attempts': 10, 'mode': 'adaptive'}))
 table_name = os.environ.get('DYNAMODB_TABLE_NAME', 'firewatch-data')
 table = dynamodb.Table(table_name)
 
 # BigDataCloud API Key from environment variable
 BIGDATACLOUD_API_KEY = os.environ.get('BIGDATACLOUD_API_KEY')
 
+# Request path with the static query parameters encoded once; each lookup
+# only appends its coordinates. The key is left out when it isn't set
+GEOCODE_PATH = '/data/reverse-geocode-client?' + urllib.parse.urlencode(
+    {'localityLanguage': 'en', 'key': BIGDATACLOUD_API_KEY} if BIGDATACLOUD_API_KEY
+    else {'localityLanguage': 'en'}
+)
+
+# Shared default for missing numeric fields (avoids re-parsing '0' per item)
+DECIMAL_ZERO = Decimal('0')
+
+# BigDataCloud response fields stored with each fire
+LOCATION_FIELDS = ('city', 'locality', 'countryName', 'principalSubdivision')
+
+# Concurrent BigDataCloud lookups per batch (matches the connection pool size)
+GEOCODE_WORKERS = 10
+
+# Keep-alive HTTPS connections to BigDataCloud, reused across calls and warm
+# invocations (single host, so no PoolManager routing per request)
+http = urllib3.HTTPSConnectionPool(
+    'api.bigdatacloud.net',
+    maxsize=GEOCODE_WORKERS,
+    retries=urllib3.Retry(3, backoff_factor=0.2),
+)
+
 def lambda_handler(event, context):
     """
     Process fire coordinates and enrich with location data from BigDataCloud
@@ -32,40 +62,47 @@ def lambda_handler(event, context):
         stored_count = 0
         results = []
         
-        for fire in fires:
-            try:
-                if 'latitude' not in fire or 'longitude' not in fire:
+        # One clock read per invocation, shared by every item
+        now = datetime.now()
+        now_ts = int(now.timestamp())
+        now_iso = now.isoformat()
+        
+        fires = [fire for fire in fires if 'latitude' in fire and 'longitude' in fire]
+        locations = get_locations_for_coordinates(
+            [(fire['latitude'], fire['longitude']) for fire in fires]
+        )
+        
+        # Buffer writes and flush them as BatchWriteItem calls (25 items each)
+        with table.batch_writer(overwrite_by_pkeys=['fire_id']) as batch:
+            for fire, location_data in zip(fires, locations):
+                try:
+                    fire_record = {
+                        'latitude': fire['latitude'],
+                        'longitude': fire['longitude'],
+                        'brightness': fire.get('brightness', 0),
+                        'confidence': fire.get('confidence', 'unknown'),
+                        'frp': fire.get('frp', 0),
+                        'acq_date': fire.get('acq_date', ''),
+                        'acq_time': fire.get('acq_time', ''),
+                        'satellite': fire.get('satellite', ''),
+                        'location_city': location_data.get('city', 'Unknown'),
+                        'location_locality': location_data.get('locality', 'Unknown'),
+                        'location_country': location_data.get('countryName', 'Unknown'),
+                        'location_state': location_data.get('principalSubdivision', 'Unknown'),
+                    }
+                    
+                    store_fire_data(fire_record, now_ts, now_iso, batch)
+                    stored_count += 1
+                    
+                    results.append({
+                        'coordinates': f"{fire['latitude']}, {fire['longitude']}",
+                        'location': f"{fire_record['location_city']}, {fire_record['location_state']}",
+                        'status': 'success'
+                    })
+                    
+                except Exception as e:
+                    print(f"Error processing fire: {str(e)}")
                     continue
-                
-                location_data = get_location_from_coordinates(
-                    fire['latitude'], 
-                    fire['longitude']
-                )
-                
-                fire_record = {
-                    'latitude': fire['latitude'],
-                    'longitude': fire['longitude'],
-                    'brightness': fire.get('brightness', 0),
-                    'confidence': fire.get('confidence', 'unknown'),
-                    'frp': fire.get('frp', 0),
-                    'location_city': location_data.get('city', 'Unknown'),
-                    'location_locality': location_data.get('locality', 'Unknown'),
-                    'location_country': location_data.get('countryName', 'Unknown'),
-                    'location_state': location_data.get('principalSubdivision', 'Unknown'),
-                }
-                
-                store_fire_data(fire_record)
-                stored_count += 1
-                
-                results.append({
-                    'coordinates': f"{fire['latitude']}, {fire['longitude']}",
-                    'location': f"{fire_record['location_city']}, {fire_record['location_state']}",
-                    'status': 'success'
-                })
-                
-            except Exception as e:
-                print(f"Error processing fire: {str(e)}")
-                continue
         
         return {
             'statusCode': 200,
@@ -83,19 +120,32 @@ def lambda_handler(event, context):
             'body': json.dumps({'error': str(e)})
         }
 
-def get_location_from_coordinates(latitude, longitude):
-    base_url = 'https://api.bigdatacloud.net/data/reverse-geocode-client'
-    params = {
-        'latitude': latitude,
-        'longitude': longitude,
-        'localityLanguage': 'en',
-        'key': BIGDATACLOUD_API_KEY
-    }
-    url = f"{base_url}?{urllib.parse.urlencode(params)}"
+def get_locations_for_coordinates(coordinates):
+    """
+    Reverse geocode a batch of (latitude, longitude) pairs
     
+    One BigDataCloud request per distinct cell, issued concurrently so the
+    batch waits on roughly one round-trip.
+    """
+    if not coordinates:
+        return []
+    
+    # Nearby fire pixels share a ~1 km cell, so look each cell up once
+    cells = [(round(lat, 2), round(lon, 2)) for lat, lon in coordinates]
+    unique_cells = list(dict.fromkeys(cells))
+    
+    with ThreadPoolExecutor(max_workers=min(GEOCODE_WORKERS, len(unique_cells))) as executor:
+        locations = dict(zip(unique_cells, executor.map(
+            lambda cell: get_location_from_coordinates(*cell),
+            unique_cells
+        )))
+    
+    return [locations[cell] for cell in cells]
+
+def get_location_from_coordinates(latitude, longitude):
+    # Nearby fire pixels share a ~1 km cell and resolve to the same place
     try:
-        with urllib.request.urlopen(url) as response:
-            return json.loads(response.read().decode('utf-8'))
+        return geocode_cached(round(latitude, 2), round(longitude, 2))
     except Exception as e:
         print(f"Geocoding error: {str(e)}")
         return {
@@ -105,24 +155,46 @@ def get_location_from_coordinates(latitude, longitude):
             'principalSubdivision': 'Unknown'
         }
 
-def store_fire_data(fire):
-    timestamp = int(datetime.now().timestamp())
-    fire_id = f"{fire['latitude']}_{fire['longitude']}_{timestamp}"
+@functools.lru_cache(maxsize=4096)
+def geocode_cached(latitude, longitude):
+    """
+    BigDataCloud lookup cached per container, so warm invocations reuse it
+    
+    Only the fields stored with each fire are kept; full responses carry
+    large localityInfo arrays that would fill the cache. Errors propagate
+    instead of returning a default so failures aren't cached.
+    """
+    # Coordinates are floats, so they need no URL quoting
+    url = f"{GEOCODE_PATH}&latitude={latitude}&longitude={longitude}"
+    
+    response = http.request('GET', url, timeout=10.0)
+    if response.status != 200:
+        raise urllib3.exceptions.HTTPError(f"HTTP {response.status}")
+    
+    location = json.loads(response.data)
+    return {field: location[field] for field in LOCATION_FIELDS if field in location}
+
+def store_fire_data(fire, now_ts, now_iso, writer=table):
+    # Same key as the deployed pipeline, so both writers upsert one item
+    fire_id = make_fire_id(fire['latitude'], fire['longitude'], fire['acq_date'], fire['acq_time'])
     
     item = {
         'fire_id': fire_id,
-        'timestamp': timestamp,
+        'timestamp': now_ts,
         'latitude': Decimal(str(fire['latitude'])),
         'longitude': Decimal(str(fire['longitude'])),
-        'brightness': Decimal(str(fire['brightness'])) if fire['brightness'] else Decimal('0'),
+        'brightness': Decimal(str(fire['brightness'])) if fire['brightness'] else DECIMAL_ZERO,
         'confidence': fire['confidence'],
-        'frp': Decimal(str(fire['frp'])) if fire['frp'] else Decimal('0'),
+        'frp': Decimal(str(fire['frp'])) if fire['frp'] else DECIMAL_ZERO,
+        'acq_date': fire['acq_date'],
+        'acq_time': fire['acq_time'],
+        'satellite': fire['satellite'],
         'location_city': fire.get('location_city', 'Unknown'),
         'location_locality': fire.get('location_locality', 'Unknown'),
         'location_state': fire.get('location_state', 'Unknown'),
         'location_country': fire.get('location_country', 'Unknown'),
-        'created_at': datetime.now().isoformat()
+        'created_at': now_iso
     }
     
-    table.put_item(Item=item)
+    writer.put_item(Item=item)
     print(f"✅ Stored: {fire_id}")
\ No newline at end of file
@@ -2,30 +2,112 @@
 Lambda function to process fire data from SQS
 Enriches with location data and stores in DynamoDB
 """
+import functools
 import json
-import urllib.request
+import logging
+import math
 import urllib.parse
+import random
+import time
 from datetime import datetime
 import boto3
+import urllib3
+from boto3.dynamodb.types import TypeSerializer
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
+from fire_keys import make_fire_id
 import os
 
 # Initialize AWS services
-dynamodb = boto3.resource('dynamodb')
+# Adaptive retries rate-limit the client itself when DynamoDB throttles,
+# so correlated write bursts back off instead of failing. Low-level client:
+# skips loading the resource model at cold start and the resource layer's
+# per-call request transformation; items are serialized explicitly
+dynamodb = boto3.client('dynamodb', config=Config(retries={'max_attempts': 10, 'mode': 'adaptive'}))
+serializer = TypeSerializer()
 secretsmanager = boto3.client('secretsmanager')
 
+# Log level follows the function's logging config (AWS_LAMBDA_LOG_LEVEL);
+# per-message and per-chunk details are DEBUG so they are dropped at INFO
+# (Lambda's TRACE has no stdlib equivalent, so it logs as DEBUG)
+logger = logging.getLogger(__name__)
+LOG_LEVEL = os.environ.get('AWS_LAMBDA_LOG_LEVEL', 'INFO')
+logger.setLevel('DEBUG' if LOG_LEVEL == 'TRACE' else LOG_LEVEL)
+
+# orjson (optional, shipped in the dependencies layer) parses geocoding
+# responses straight from bytes. SQS bodies stay on the stdlib parser,
+# which can read floats directly into Decimal (see lambda_handler)
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
 TABLE_NAME = os.environ['DYNAMODB_TABLE_NAME']
 BIGDATA_SECRET_NAME = os.environ['BIGDATA_SECRET_NAME']
 
-table = dynamodb.Table(TABLE_NAME)
+# Shared default for missing numeric fields (avoids re-parsing '0' per item)
+DECIMAL_ZERO = Decimal('0')
+
+# BatchWriteItem accepts at most 25 puts per request
+BATCH_WRITE_SIZE = 25
+BATCH_WRITE_ATTEMPTS = 5
+BATCH_WRITE_BASE_DELAY = 0.05  # seconds, doubled on each retry
+RETRYABLE_WRITE_ERRORS = (
+    'ProvisionedThroughputExceededException',
+    'ThrottlingException',
+    'RequestLimitExceeded',
+    'InternalServerError',
+)
+
+# BigDataCloud response fields stored with each fire
+LOCATION_FIELDS = ('city', 'locality', 'countryName', 'principalSubdivision')
 
-# Cache for API key (loaded once per container lifecycle)
-_api_key_cache = None
+# Concurrent BigDataCloud lookups per batch (matches the connection pool size)
+GEOCODE_WORKERS = int(os.environ.get('GEO_WORKERS', '16'))
+
+# Keep-alive HTTPS connections to BigDataCloud, shared by the geocoding
+# threads and reused across warm invocations. Every lookup hits the same
+# host, so a single-host pool skips PoolManager's per-request URL routing
+http = urllib3.HTTPSConnectionPool(
+    'api.bigdatacloud.net',
+    maxsize=GEOCODE_WORKERS,
+    retries=urllib3.Retry(3, backoff_factor=0.2),
+)
+
+# Geocoding threads, started on first use and kept across warm invocations
+# instead of being spawned and joined for every batch
+geocode_executor = ThreadPoolExecutor(max_workers=GEOCODE_WORKERS, thread_name_prefix='geocode')
+
+def get_bigdata_api_key():
+    """Get BigDataCloud API key from Secrets Manager"""
+    try:
+        response = secretsmanager.get_secret_value(SecretId=BIGDATA_SECRET_NAME)
+        secret = json.loads(response['SecretString'])
+        return secret.get('api_key', '')
+    except Exception as e:
+        logger.warning("⚠️  Could not load BigDataCloud API key: %s", e)
+        return ''
+
+# Loaded once per container at cold start, during init rather than
+# inside the first request (provisioned concurrency pre-warms it)
+BIGDATA_API_KEY = get_bigdata_api_key()
+
+# Request path with the static query parameters encoded once; each lookup
+# only appends its coordinates
+GEOCODE_PATH = '/data/reverse-geocode-client?' + urllib.parse.urlencode(
+    {'localityLanguage': 'en', 'key': BIGDATA_API_KEY} if BIGDATA_API_KEY
+    else {'localityLanguage': 'en'}
+)
 
 def lambda_handler(event, context):
     """
     Process fire records from SQS, enrich with location data, and store in DynamoDB
     
+    Returns a partial batch response: only messages listed in
+    batchItemFailures are redelivered by SQS.
+    
     Event format (from SQS):
     {
         "Records": [
@@ -36,46 +118,98 @@ def lambda_handler(event, context):
     }
     """
     try:
-        print(f"🔄 Processing {len(event['Records'])} SQS messages")
+        logger.debug("🔄 Processing %d SQS messages", len(event['Records']))
+        
+        # One clock read per invocation, shared by every item in the batch
+        now = datetime.now()
+        now_ts = int(now.timestamp())
+        now_iso = now.isoformat()
         
         total_processed = 0
-        total_stored = 0
         errors = []
+        failed_message_ids = set()
         
-        # Process each SQS message
+        # Items keyed by fire_id: the same detection can arrive in more than
+        # one message, and BatchWriteItem rejects duplicate keys in a request
+        items = {}
+        item_messages = {}
+        
+        # Parse every message first so the whole SQS batch is geocoded together
+        batch_fires = []
+        batch_coordinates = []
         for record in event['Records']:
+            message_id = record['messageId']
             try:
-                # Parse message body
-                message = json.loads(record['body'])
+                # Parse message body. Floats are read straight into Decimal,
+                # the type DynamoDB needs, with no float -> str round trip;
+                # NaN/Infinity can't be stored, so they fail the message
+                message = json.loads(record['body'], parse_float=Decimal, parse_constant=reject_json_constant)
                 fires = message.get('fires', [])
                 batch_id = message.get('batch_id', 'unknown')
                 
-                print(f"📦 Processing batch {batch_id} with {len(fires)} fires")
+                logger.debug("📦 Processing batch %s with %d fires", batch_id, len(fires))
                 
-                # Process each fire in the batch
+                # Coordinates are checked here so a bad fire fails only its
+                # own message; none of the message's fires are kept
+                message_fires = []
                 for fire in fires:
-                    try:
-                        success = process_fire(fire)
-                        if success:
-                            total_stored += 1
-                        total_processed += 1
-                    except Exception as e:
-                        print(f"⚠️  Error processing individual fire: {str(e)}")
-                        errors.append({
-                            'fire': fire,
-                            'error': str(e)
-                        })
+                    coordinates = get_fire_coordinates(fire)
+                    if coordinates is None:
+                        logger.debug("⚠️  Skipping fire with missing coordinates")
                         continue
+                    message_fires.append((fire, coordinates))
                 
-                print(f"✅ Batch {batch_id} complete: {total_stored} stored")
+                for fire, coordinates in message_fires:
+                    batch_fires.append((message_id, fire))
+                    batch_coordinates.append(coordinates)
                 
             except Exception as e:
-                print(f"❌ Error processing SQS record: {str(e)}")
+                logger.error("❌ Error processing SQS record %s: %s", message_id, e)
+                errors.append({
+                    'record': message_id,
+                    'error': str(e)
+                })
+                failed_message_ids.add(message_id)
+                continue
+        
+        locations = get_locations_for_coordinates(batch_coordinates)
+        
+        for (message_id, fire), location_data in zip(batch_fires, locations):
+            try:
+                item = process_fire(fire, location_data, now_ts, now_iso)
+                # Serialized here so a value DynamoDB can't store (e.g. out
+                # of range) fails only this fire's message
+                serialized = serialize_item(item)
+                total_processed += 1
+            except Exception as e:
+                logger.warning("⚠️  Error processing individual fire: %s", e)
                 errors.append({
-                    'record': record['messageId'],
+                    'fire': fire,
                     'error': str(e)
                 })
+                failed_message_ids.add(message_id)
                 continue
+            
+            items[item['fire_id']] = serialized
+            item_messages.setdefault(item['fire_id'], set()).add(message_id)
+        
+        # Flush everything in BatchWriteItem chunks, then retry any message
+        # that carried a fire which could not be written
+        failed_fire_ids = write_fire_items(list(items.values()))
+        for fire_id in failed_fire_ids:
+            errors.append({
+                'fire_id': fire_id,
+                'error': 'DynamoDB write failed'
+            })
+            failed_message_ids.update(item_messages[fire_id])
+        
+        total_stored = len(items) - len(failed_fire_ids)
+        
+        # One summary line per invocation
+        logger.info(
+            "✅ Processing complete: %d messages, %d processed, %d stored, %d errors, %d messages failed",
+            len(event['Records']), total_processed, total_stored, len(errors), len(failed_message_ids)
+        )
         
         # Return summary
         return {
@@ -86,44 +220,49 @@ def lambda_handler(event, context):
                 'stored': total_stored,
                 'errors': len(errors),
                 'error_details': errors[:10] if errors else [],  # Limit error details
-                'timestamp': datetime.now().isoformat()
-            })
+                'timestamp': now_iso
+            }, default=str),  # error details carry Decimal fire fields
+            'batchItemFailures': [
+                {'itemIdentifier': message_id} for message_id in failed_message_ids
+            ]
         }
         
     except Exception as e:
-        print(f"❌ Critical error in handler: {str(e)}")
+        logger.exception("❌ Critical error in handler: %s", e)
         return {
             'statusCode': 500,
             'body': json.dumps({
                 'error': str(e),
                 'timestamp': datetime.now().isoformat()
-            })
+            }),
+            # Nothing is known to be stored, so have SQS redeliver every message
+            'batchItemFailures': [
+                {'itemIdentifier': record['messageId']} for record in event.get('Records', [])
+            ]
         }
 
-def process_fire(fire):
+def process_fire(fire, location_data, now_ts, now_iso):
     """
-    Process a single fire record: geocode and store
+    Process a single fire record: enrich with its location and build its item
+    
+    Coordinates are validated beforehand by get_fire_coordinates.
     
     Args:
         fire: Fire record dictionary
+        location_data: Location data for the fire's coordinates
+        now_ts: Invocation time as epoch seconds
+        now_iso: Invocation time as an ISO 8601 string
     
     Returns:
-        bool: True if stored successfully
+        dict: DynamoDB item
     """
     try:
-        # Validate required fields
-        if 'latitude' not in fire or 'longitude' not in fire:
-            print(f"⚠️  Skipping fire with missing coordinates")
-            return False
-        
         lat = fire['latitude']
         lon = fire['longitude']
         
-        # Get location data from BigDataCloud
-        location_data = get_location_from_coordinates(lat, lon)
-        
         # Build fire record
         fire_record = {
+            'fire_id': fire.get('fire_id'),
             'latitude': lat,
             'longitude': lon,
             'brightness': fire.get('brightness', 0),
@@ -140,51 +279,96 @@ def process_fire(fire):
             'location_state': location_data.get('principalSubdivision', 'Unknown'),
         }
         
-        # Store in DynamoDB
-        store_fire_data(fire_record)
-        
-        return True
+        return build_fire_item(fire_record, now_ts, now_iso)
         
     except Exception as e:
-        print(f"Error processing fire at ({fire.get('latitude')}, {fire.get('longitude')}): {str(e)}")
+        logger.error("Error processing fire at (%s, %s): %s", fire.get('latitude'), fire.get('longitude'), e)
         raise
 
-def get_location_from_coordinates(latitude, longitude):
+def reject_json_constant(name):
     """
-    Get location information from coordinates using BigDataCloud API
+    Reject NaN and Infinity in a message body (json.loads parse_constant)
+    
+    Raises:
+        ValueError: Always; DynamoDB numbers must be finite
+    """
+    raise ValueError(f"Non-finite number {name} in message")
+
+def get_fire_coordinates(fire):
+    """
+    Validate a fire's coordinates and convert them for geocoding
     
     Args:
-        latitude: Latitude coordinate
-        longitude: Longitude coordinate
+        fire: Fire record from an SQS message
     
     Returns:
-        dict: Location data
+        tuple: (latitude, longitude) as floats, or None if either is missing
+    
+    Raises:
+        ValueError: If the fire is not a record or a coordinate is not a
+            finite number
     """
-    global _api_key_cache
+    if not isinstance(fire, dict):
+        raise ValueError(f"Fire record is not an object: {fire!r}")
     
-    # Load API key from cache or Secrets Manager
-    if _api_key_cache is None:
-        _api_key_cache = get_bigdata_api_key()
+    if 'latitude' not in fire or 'longitude' not in fire:
+        return None
     
-    base_url = 'https://api.bigdatacloud.net/data/reverse-geocode-client'
-    params = {
-        'latitude': latitude,
-        'longitude': longitude,
-        'localityLanguage': 'en',
-    }
+    try:
+        latitude = float(fire['latitude'])
+        longitude = float(fire['longitude'])
+    except (TypeError, ValueError):
+        latitude = longitude = math.nan
     
-    # Add API key if available
-    if _api_key_cache:
-        params['key'] = _api_key_cache
+    if not (math.isfinite(latitude) and math.isfinite(longitude)):
+        raise ValueError(f"Invalid coordinates ({fire['latitude']!r}, {fire['longitude']!r})")
     
-    url = f"{base_url}?{urllib.parse.urlencode(params)}"
+    return latitude, longitude
+
+def get_locations_for_coordinates(coordinates):
+    """
+    Reverse geocode a batch of (latitude, longitude) pairs
     
+    Args:
+        coordinates: List of (latitude, longitude) tuples
+    
+    Returns:
+        list: Location data for each coordinate pair
+    """
+    if not coordinates:
+        return []
+    
+    # Nearby fire pixels share a ~1 km cell, so look each cell up once per
+    # batch; lookups are network-bound, so overlap them across the pool
+    cells = [(round(lat, 2), round(lon, 2)) for lat, lon in coordinates]
+    unique_cells = list(dict.fromkeys(cells))
+    
+    if len(unique_cells) == 1:
+        locations = {unique_cells[0]: get_location_from_coordinates(*unique_cells[0])}
+    else:
+        locations = dict(zip(unique_cells, geocode_executor.map(
+            lambda cell: get_location_from_coordinates(*cell),
+            unique_cells
+        )))
+    
+    return [locations[cell] for cell in cells]
+
+def get_location_from_coordinates(latitude, longitude):
+    """
+    Get location information from coordinates using BigDataCloud API
+    
+    Args:
+        latitude: Latitude coordinate
+        longitude: Longitude coordinate
+    
+    Returns:
+        dict: Location data
+    """
+    # Nearby fire pixels share a ~1 km cell and resolve to the same place
     try:
-        with urllib.request.urlopen(url, timeout=10) as response:
-            location_data = json.loads(response.read().decode('utf-8'))
-            return location_data
+        return geocode_cached(round(latitude, 2), round(longitude, 2))
     except Exception as e:
-        print(f"⚠️  Geocoding error for ({latitude}, {longitude}): {str(e)}")
+        logger.warning("⚠️  Geocoding error for (%s, %s): %s", latitude, longitude, e)
         # Return default values on error
         return {
             'city': 'Unknown',
@@ -193,43 +377,52 @@ def get_location_from_coordinates(latitude, longitude):
             'principalSubdivision': 'Unknown'
         }
 
-def get_bigdata_api_key():
-    """Get BigDataCloud API key from Secrets Manager"""
-    try:
-        response = secretsmanager.get_secret_value(SecretId=BIGDATA_SECRET_NAME)
-        secret = json.loads(response['SecretString'])
-        return secret.get('api_key', '')
-    except Exception as e:
-        print(f"⚠️  Could not load BigDataCloud API key: {str(e)}")
-        return ''
+@functools.lru_cache(maxsize=10000)
+def geocode_cached(latitude, longitude):
+    """
+    BigDataCloud lookup cached per container, so warm invocations reuse it
+    
+    Only the fields stored with each fire are kept; full responses carry
+    large localityInfo arrays that would fill the cache. Errors propagate
+    instead of returning a default so failures aren't cached.
+    """
+    # Coordinates are floats, so they need no URL quoting
+    url = f"{GEOCODE_PATH}&latitude={latitude}&longitude={longitude}"
+    
+    response = http.request('GET', url, timeout=10.0)
+    if response.status != 200:
+        raise urllib3.exceptions.HTTPError(f"HTTP {response.status}")
+    
+    location = json_loads(response.data)
+    return {field: location[field] for field in LOCATION_FIELDS if field in location}
 
-def store_fire_data(fire):
+def build_fire_item(fire, now_ts, now_iso):
     """
-    Store fire data in DynamoDB with deduplication
+    Build the DynamoDB item for an enriched fire record
     
     Args:
         fire: Fire record dictionary
+        now_ts: Invocation time as epoch seconds
+        now_iso: Invocation time as an ISO 8601 string
+    
+    Returns:
+        dict: DynamoDB item keyed by a deterministic fire_id
     """
-    timestamp = int(datetime.now().timestamp())
-    
-    # Create unique fire_id based on coordinates and acquisition date/time
-    # This helps avoid duplicates from overlapping API calls
-    acq_datetime = f"{fire.get('acq_date', '')}_{fire.get('acq_time', '')}"
-    if acq_datetime == "_":
-        # Fallback to current timestamp if no acquisition time
-        fire_id = f"{fire['latitude']}_{fire['longitude']}_{timestamp}"
-    else:
-        fire_id = f"{fire['latitude']}_{fire['longitude']}_{acq_datetime}"
+    # fetch_fires sends the key precomputed; build it for older messages
+    fire_id = fire['fire_id'] or make_fire_id(
+        fire['latitude'], fire['longitude'], fire.get('acq_date', ''), fire.get('acq_time', '')
+    )
     
     # Build DynamoDB item
     item = {
         'fire_id': fire_id,
-        'timestamp': timestamp,
-        'latitude': Decimal(str(fire['latitude'])),
-        'longitude': Decimal(str(fire['longitude'])),
-        'brightness': Decimal(str(fire['brightness'])) if fire['brightness'] else Decimal('0'),
+        'timestamp': now_ts,
+        # Numeric fields are already Decimal (see parse_float in lambda_handler)
+        'latitude': fire['latitude'],
+        'longitude': fire['longitude'],
+        'brightness': fire['brightness'] or DECIMAL_ZERO,
         'confidence': fire['confidence'],
-        'frp': Decimal(str(fire['frp'])) if fire['frp'] else Decimal('0'),
+        'frp': fire['frp'] or DECIMAL_ZERO,
         'acq_date': fire.get('acq_date', ''),
         'acq_time': fire.get('acq_time', ''),
         'satellite': fire.get('satellite', ''),
@@ -239,19 +432,72 @@ def store_fire_data(fire):
         'location_locality': fire.get('location_locality', 'Unknown'),
         'location_state': fire.get('location_state', 'Unknown'),
         'location_country': fire.get('location_country', 'Unknown'),
-        'created_at': datetime.now().isoformat()
+        'created_at': now_iso
     }
     
-    try:
-        # Use put_item with condition to prevent overwriting existing records
-        table.put_item(
-            Item=item,
-            ConditionExpression='attribute_not_exists(fire_id)'
-        )
-        print(f"✅ Stored: {fire_id} ({item['location_city']}, {item['location_state']})")
-    except dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
-        print(f"ℹ️  Duplicate fire_id {fire_id}, skipping")
-    except Exception as e:
-        print(f"❌ Error storing fire {fire_id}: {str(e)}")
-        raise
+    return item
+
+def write_fire_items(items):
+    """
+    Write fire items to DynamoDB with BatchWriteItem
+    
+    Unprocessed items, throttled requests and DynamoDB internal errors are
+    retried with jittered exponential backoff, on top of the client's own
+    adaptive retries. Items share a fire_id only when they describe the
+    same detection, so a re-delivered fire simply overwrites its record.
+    
+    Args:
+        items: List of serialized DynamoDB items (see serialize_item) with
+            unique fire_ids
+    
+    Returns:
+        list: fire_ids that could not be written
+    """
+    failed_fire_ids = []
+    
+    for start in range(0, len(items), BATCH_WRITE_SIZE):
+        chunk = items[start:start + BATCH_WRITE_SIZE]
+        requests = [{'PutRequest': {'Item': item}} for item in chunk]
+        attempt = 0
+        
+        while requests:
+            try:
+                response = dynamodb.batch_write_item(
+                    RequestItems={TABLE_NAME: requests}
+                )
+                requests = response.get('UnprocessedItems', {}).get(TABLE_NAME, [])
+            except ClientError as e:
+                if e.response['Error']['Code'] not in RETRYABLE_WRITE_ERRORS:
+                    logger.error("❌ Error writing batch: %s", e)
+                    break
+            
+            if not requests:
+                break
+            
+            attempt += 1
+            if attempt == BATCH_WRITE_ATTEMPTS:
+                break
+            time.sleep(random.uniform(0, BATCH_WRITE_BASE_DELAY * 2 ** attempt))
+        
+        if requests:
+            logger.error("❌ %d of %d items not written", len(requests), len(chunk))
+            failed_fire_ids.extend(
+                request['PutRequest']['Item']['fire_id']['S'] for request in requests
+            )
+        else:
+            logger.debug("✅ Stored %d fires", len(chunk))
+    
+    return failed_fire_ids
 
+def serialize_item(item):
+    """
+    Convert an item to DynamoDB attribute-value format
+    
+    Args:
+        item: Item with Python values (str, int, Decimal, None)
+    
+    Returns:
+        dict: Item for the low-level client, e.g. {'frp': {'N': '1.5'}}
+    """
+    serialize = serializer.serialize
+    return {name: serialize(value) for name, value in item.items()}
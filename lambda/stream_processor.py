@@ -3,15 +3,39 @@ Lambda function to process DynamoDB Streams
 Monitors changes to the fire data table and sends notifications
 """
 import json
+import logging
+import random
+import time
 import boto3
-from datetime import datetime
+from collections import defaultdict
+from datetime import datetime, timezone
 import os
 
 # Initialize AWS services
 sns = boto3.client('sns')
 
+# Log level follows the function's logging config (AWS_LAMBDA_LOG_LEVEL);
+# the record count at entry is DEBUG so it is dropped at INFO
+# (Lambda's TRACE has no stdlib equivalent, so it logs as DEBUG)
+logger = logging.getLogger(__name__)
+LOG_LEVEL = os.environ.get('AWS_LAMBDA_LOG_LEVEL', 'INFO')
+logger.setLevel('DEBUG' if LOG_LEVEL == 'TRACE' else LOG_LEVEL)
+
+# Stand-ins for attributes missing from a stream image
+MISSING_UNKNOWN = {'S': 'Unknown'}
+MISSING_CONFIDENCE = {'S': 'unknown'}
+MISSING_NUMBER = {'N': '0'}
+
 SNS_TOPIC_ARN = os.environ['SNS_TOPIC_ARN']
 
+# publish_batch accepts at most 10 messages per call
+SNS_BATCH_SIZE = 10
+PUBLISH_ATTEMPTS = 3
+PUBLISH_BASE_DELAY = 0.1  # seconds, doubled on each retry
+
+# SNS rejects subjects of 100 characters or more
+SNS_SUBJECT_MAX_LENGTH = 99
+
 def lambda_handler(event, context):
     """
     Process DynamoDB Stream events
@@ -31,51 +55,48 @@ def lambda_handler(event, context):
     }
     """
     try:
-        print(f"📊 Processing {len(event['Records'])} DynamoDB stream records")
+        logger.debug("📊 Processing %d DynamoDB stream records", len(event['Records']))
         
-        new_fires = []
-        updated_fires = []
-        removed_fires = []
+        # One clock read per invocation, used for the alert and the response
+        now = datetime.now(timezone.utc)
         
-        # Process each stream record
-        for record in event['Records']:
-            event_name = record['eventName']
-            
-            if event_name == 'INSERT':
-                fire = parse_dynamodb_item(record['dynamodb']['NewImage'])
-                new_fires.append(fire)
-                
-            elif event_name == 'MODIFY':
-                fire = parse_dynamodb_item(record['dynamodb']['NewImage'])
-                updated_fires.append(fire)
-                
-            elif event_name == 'REMOVE':
-                fire = parse_dynamodb_item(record['dynamodb']['OldImage'])
-                removed_fires.append(fire)
+        records = event['Records']
+        
+        # Only new fires are alerted on, so only their images are parsed,
+        # and only for the fields the alert uses
+        new_fires = [
+            parse_alert_fire(record['dynamodb']['NewImage'])
+            for record in records
+            if record['eventName'] == 'INSERT'
+        ]
+        updated_count = sum(1 for record in records if record['eventName'] == 'MODIFY')
+        removed_count = sum(1 for record in records if record['eventName'] == 'REMOVE')
         
         # Send notifications for new fires
+        alerts_dropped = 0
         if new_fires:
-            send_fire_alerts(new_fires)
+            alerts_dropped = send_fire_alerts(new_fires, now)
         
-        # Log statistics
-        print(f"✅ Stream processing complete:")
-        print(f"   - New fires: {len(new_fires)}")
-        print(f"   - Updated fires: {len(updated_fires)}")
-        print(f"   - Removed fires: {len(removed_fires)}")
+        # One summary line per invocation
+        logger.info(
+            "✅ Stream processing complete: %d new, %d updated, %d removed, %d alerts rejected by SNS",
+            len(new_fires), updated_count, removed_count, alerts_dropped
+        )
         
         return {
             'statusCode': 200,
             'body': json.dumps({
                 'message': 'Stream processing complete',
                 'new_fires': len(new_fires),
-                'updated_fires': len(updated_fires),
-                'removed_fires': len(removed_fires),
-                'timestamp': datetime.now().isoformat()
+                'updated_fires': updated_count,
+                'removed_fires': removed_count,
+                'alerts_dropped': alerts_dropped,
+                'timestamp': now.isoformat()
             })
         }
         
     except Exception as e:
-        print(f"❌ Error processing stream: {str(e)}")
+        logger.exception("❌ Error processing stream: %s", e)
         return {
             'statusCode': 500,
             'body': json.dumps({
@@ -84,123 +105,174 @@ def lambda_handler(event, context):
             })
         }
 
-def parse_dynamodb_item(dynamodb_item):
+def parse_alert_fire(image):
     """
-    Parse DynamoDB item from stream record
+    Extract the fields used in alerts from a stream image
     
     Args:
-        dynamodb_item: DynamoDB item in stream format
+        image: DynamoDB item in stream format (NewImage)
     
     Returns:
-        dict: Parsed fire record
+        tuple: (country, city, state, latitude, longitude, confidence, frp)
     """
-    try:
-        fire = {
-            'fire_id': dynamodb_item.get('fire_id', {}).get('S', ''),
-            'latitude': float(dynamodb_item.get('latitude', {}).get('N', 0)),
-            'longitude': float(dynamodb_item.get('longitude', {}).get('N', 0)),
-            'brightness': float(dynamodb_item.get('brightness', {}).get('N', 0)),
-            'confidence': dynamodb_item.get('confidence', {}).get('S', 'unknown'),
-            'frp': float(dynamodb_item.get('frp', {}).get('N', 0)),
-            'location_city': dynamodb_item.get('location_city', {}).get('S', 'Unknown'),
-            'location_state': dynamodb_item.get('location_state', {}).get('S', 'Unknown'),
-            'location_country': dynamodb_item.get('location_country', {}).get('S', 'Unknown'),
-            'satellite': dynamodb_item.get('satellite', {}).get('S', ''),
-            'acq_date': dynamodb_item.get('acq_date', {}).get('S', ''),
-            'acq_time': dynamodb_item.get('acq_time', {}).get('S', ''),
-        }
-        return fire
-    except Exception as e:
-        print(f"Error parsing DynamoDB item: {str(e)}")
-        return {}
+    # Attributes stored with another type (e.g. {'NULL': True} for a None
+    # field) fall back to the same defaults as missing ones
+    get = image.get
+    return (
+        get('location_country', MISSING_UNKNOWN).get('S', 'Unknown'),
+        get('location_city', MISSING_UNKNOWN).get('S', 'Unknown'),
+        get('location_state', MISSING_UNKNOWN).get('S', 'Unknown'),
+        float(get('latitude', MISSING_NUMBER).get('N', '0')),
+        float(get('longitude', MISSING_NUMBER).get('N', '0')),
+        get('confidence', MISSING_CONFIDENCE).get('S', 'unknown'),
+        float(get('frp', MISSING_NUMBER).get('N', '0')),
+    )
 
-def send_fire_alerts(fires):
+def send_fire_alerts(fires, detected_at):
     """
     Send SNS notifications for new fires
     
     Args:
-        fires: List of new fire records
+        fires: New fire tuples from parse_alert_fire
+        detected_at: UTC datetime shown as the detection time
+    
+    Returns:
+        int: Number of alerts SNS rejected as sender faults
     """
     try:
         # Group fires by country for better notification organization
-        fires_by_country = {}
+        fires_by_country = defaultdict(list)
         for fire in fires:
-            country = fire.get('location_country', 'Unknown')
-            if country not in fires_by_country:
-                fires_by_country[country] = []
-            fires_by_country[country].append(fire)
-        
-        # Create notification message
-        total_fires = len(fires)
-        countries = list(fires_by_country.keys())
-        
-        # Build summary message
-        subject = f"🔥 Firewatch Alert: {total_fires} New Fire(s) Detected"
+            fires_by_country[fire[0]].append(fire)
         
-        message_lines = [
-            f"Firewatch has detected {total_fires} new active fire(s).",
-            f"",
-            f"Summary by Country:",
-            f"─────────────────────"
-        ]
+        footer = "\n".join([
+            "",
+            "─────────────────────",
+            f"Detection time: {detected_at.strftime('%Y-%m-%d %H:%M:%S UTC')}",
+            "",
+            "This is an automated alert from Firewatch.",
+        ])
         
-        # Add country breakdown
-        for country, country_fires in sorted(fires_by_country.items()):
-            message_lines.append(f"")
-            message_lines.append(f"📍 {country}: {len(country_fires)} fire(s)")
-            
-            # Add details for first 5 fires per country
-            for i, fire in enumerate(country_fires[:5]):
-                location = f"{fire.get('location_city', 'Unknown')}, {fire.get('location_state', 'Unknown')}"
-                coords = f"({fire.get('latitude', 0):.4f}, {fire.get('longitude', 0):.4f})"
-                confidence = fire.get('confidence', 'unknown')
-                frp = fire.get('frp', 0)
-                
-                message_lines.append(
-                    f"  • {location} {coords}"
-                )
-                message_lines.append(
-                    f"    Confidence: {confidence}, FRP: {frp:.1f} MW"
-                )
+        # One message per country, so subscribers can filter on country
+        entries = []
+        for index, (country, country_fires) in enumerate(sorted(fires_by_country.items())):
+            total_fires = len(country_fires)
+            message = "\n".join([
+                f"Firewatch has detected {total_fires} new active fire(s) in {country}.",
+                "─────────────────────",
+                format_country_summary(country, country_fires),
+                footer,
+            ])
+            # Long country names (e.g. the UK's full countryName) would push
+            # the subject past the SNS limit and get the alert rejected
+            subject = f"🔥 Firewatch Alert: {total_fires} New Fire(s) Detected in {country}"
+            if len(subject) > SNS_SUBJECT_MAX_LENGTH:
+                subject = subject[:SNS_SUBJECT_MAX_LENGTH - 3] + "..."
             
-            if len(country_fires) > 5:
-                message_lines.append(f"  ... and {len(country_fires) - 5} more")
-        
-        # Add footer
-        message_lines.extend([
-            f"",
-            f"─────────────────────",
-            f"Detection time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S UTC')}",
-            f"",
-            f"This is an automated alert from Firewatch.",
-        ])
+            entries.append({
+                'Id': str(index),
+                'Subject': subject,
+                'Message': message,
+                'MessageAttributes': {
+                    'fire_count': {
+                        'DataType': 'Number',
+                        'StringValue': str(total_fires)
+                    },
+                    # Plain String: each message covers one country. Holds
+                    # BigDataCloud's countryName (e.g. "Canada"), so filter
+                    # policies must list full names, not ISO codes
+                    'countries': {
+                        'DataType': 'String',
+                        'StringValue': country
+                    }
+                }
+            })
         
-        message = "\n".join(message_lines)
+        published, dropped = publish_alerts(entries)
         
-        # Send to SNS
-        response = sns.publish(
-            TopicArn=SNS_TOPIC_ARN,
-            Subject=subject,
-            Message=message,
-            MessageAttributes={
-                'fire_count': {
-                    'DataType': 'Number',
-                    'StringValue': str(total_fires)
-                },
-                'countries': {
-                    'DataType': 'String.Array',
-                    'StringValue': json.dumps(countries)
-                }
-            }
-        )
+        logger.info("📧 Sent %d SNS notification(s) for %d fire(s)", published, len(fires))
+        if dropped:
+            logger.error("❌ %d SNS notification(s) rejected and dropped", dropped)
         
-        print(f"📧 Sent SNS notification: {response['MessageId']}")
-        print(f"   Subject: {subject}")
+        return dropped
         
     except Exception as e:
-        print(f"❌ Error sending fire alerts: {str(e)}")
+        logger.error("❌ Error sending fire alerts: %s", e)
         raise
 
+def publish_alerts(entries):
+    """
+    Publish alert messages with SNS publish_batch
+    
+    Entries that fail on the SNS side are retried with jittered
+    exponential backoff; sender faults are not retryable, so they are
+    logged and counted as dropped.
+    
+    Args:
+        entries: PublishBatchRequestEntries with unique Ids
+    
+    Returns:
+        tuple: (messages published, messages dropped as sender faults)
+    
+    Raises:
+        RuntimeError: If entries are still failing after the last attempt
+    """
+    published = 0
+    dropped = 0
+    
+    for start in range(0, len(entries), SNS_BATCH_SIZE):
+        pending = entries[start:start + SNS_BATCH_SIZE]
+        
+        for attempt in range(PUBLISH_ATTEMPTS):
+            response = sns.publish_batch(
+                TopicArn=SNS_TOPIC_ARN,
+                PublishBatchRequestEntries=pending
+            )
+            published += len(response.get('Successful', []))
+            
+            retry_ids = set()
+            for failure in response.get('Failed', []):
+                if failure.get('SenderFault'):
+                    dropped += 1
+                    logger.error("❌ SNS rejected entry %s: %s", failure['Id'], failure.get('Message', failure['Code']))
+                else:
+                    logger.warning("⚠️  SNS publish failed for entry %s: %s", failure['Id'], failure.get('Message', failure['Code']))
+                    retry_ids.add(failure['Id'])
+            
+            pending = [entry for entry in pending if entry['Id'] in retry_ids]
+            if not pending:
+                break
+            if attempt < PUBLISH_ATTEMPTS - 1:
+                time.sleep(random.uniform(0, PUBLISH_BASE_DELAY * 2 ** (attempt + 1)))
+        
+        if pending:
+            raise RuntimeError(f"{len(pending)} alert(s) not published after {PUBLISH_ATTEMPTS} attempts")
+    
+    return published, dropped
+
+def format_country_summary(country, country_fires):
+    """
+    Format one country's block of the alert message
+    
+    Args:
+        country: Country name
+        country_fires: Fire tuples detected in that country
+    
+    Returns:
+        str: Country header followed by details for its first 5 fires
+    """
+    details = "\n".join(
+        f"  • {city}, {state} ({latitude:.4f}, {longitude:.4f})\n"
+        f"    Confidence: {confidence}, FRP: {frp:.1f} MW"
+        for _, city, state, latitude, longitude, confidence, frp in country_fires[:5]
+    )
+    section = f"\n📍 {country}: {len(country_fires)} fire(s)\n{details}"
+    
+    if len(country_fires) > 5:
+        section += f"\n  ... and {len(country_fires) - 5} more"
+    
+    return section
+
 def format_fire_location(fire):
     """Format fire location for display"""
     city = fire.get('location_city', 'Unknown')
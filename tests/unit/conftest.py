@@ -0,0 +1,57 @@
+import importlib
+import os
+import sys
+from unittest import mock
+
+import pytest
+
+LAMBDA_DIR = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, "lambda")
+
+# Environment the stack gives the functions (plus a region for boto3)
+HANDLER_ENV = {
+    "AWS_DEFAULT_REGION": "us-east-1",
+    "DYNAMODB_TABLE_NAME": "firewatch-data",
+    "BIGDATA_SECRET_NAME": "firewatch/bigdatacloud-api-key",
+    "FIRMS_SECRET_NAME": "firewatch/nasa-firms-api-key",
+    "QUEUE_URL": "https://sqs.us-east-1.amazonaws.com/123456789012/firewatch-data-queue",
+    "SNS_TOPIC_ARN": "arn:aws:sns:us-east-1:123456789012:firewatch-alerts",
+}
+
+
+@pytest.fixture
+def load_handler(monkeypatch):
+    """
+    Import a Lambda module with stubbed boto3 clients
+
+    The handlers create their clients at import time, so each call imports
+    a fresh copy of the module while boto3.client is patched. Returns the
+    module and its client stubs keyed by service name.
+    """
+    monkeypatch.syspath_prepend(LAMBDA_DIR)
+    for name, value in HANDLER_ENV.items():
+        monkeypatch.setenv(name, value)
+
+    loaded = []
+
+    def load(module_name):
+        clients = {}
+
+        def client(service_name, *args, **kwargs):
+            if service_name not in clients:
+                clients[service_name] = mock.MagicMock(name=service_name)
+                # Secrets resolve to an empty secret unless a test sets one
+                clients[service_name].get_secret_value.return_value = {"SecretString": "{}"}
+            return clients[service_name]
+
+        with mock.patch("boto3.client", side_effect=client), mock.patch("boto3.resource"):
+            sys.modules.pop(module_name, None)
+            module = importlib.import_module(module_name)
+
+        loaded.append(module_name)
+        return module, clients
+
+    yield load
+
+    for module_name in loaded:
+        sys.modules.pop(module_name, None)
+
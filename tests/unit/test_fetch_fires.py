@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+HEADER = "latitude,longitude,bright_ti4,scan,track,acq_date,acq_time,satellite,instrument,confidence,version,bright_ti5,frp,daynight"
+
+
+@pytest.fixture
+def fetch_fires(load_handler):
+    return load_handler("fetch_fires")
+
+
+def test_parse_csv_data_defaults_missing_columns(fetch_fires):
+    module, _ = fetch_fires
+
+    (fire,) = module.parse_csv_data([
+        "latitude,longitude,acq_date,acq_time,frp",
+        "34.0522,-118.2437,2024-01-15,0130,12.3",
+    ])
+
+    assert fire == {
+        "latitude": 34.0522,
+        "longitude": -118.2437,
+        "brightness": 0,
+        "confidence": "unknown",
+        "frp": 12.3,
+        "acq_date": "2024-01-15",
+        "acq_time": "0130",
+        "satellite": "",
+        "instrument": "",
+        "daynight": "",
+        "fire_id": "34.0522_-118.2437_2024-01-15_0130",
+    }
+
+
+def test_parse_csv_data_skips_short_and_invalid_rows(fetch_fires):
+    module, _ = fetch_fires
+
+    fires = list(module.parse_csv_data([
+        HEADER,
+        "34.0522,-118.2437,330.5,0.4,0.4,2024-01-15,0130,N,VIIRS,n,2.0NRT,290.1,12.3,N",
+        "36.7783,-119.4179,330.5",
+        "",
+        "north,-119.4179,330.5,0.4,0.4,2024-01-15,0130,N,VIIRS,n,2.0NRT,290.1,12.3,N",
+        "38.5816,-121.4944,301.2,0.4,0.4,2024-01-15,0131,N,VIIRS,h,2.0NRT,288.0,5.0,N",
+    ]))
+
+    assert [fire["fire_id"] for fire in fires] == [
+        "34.0522_-118.2437_2024-01-15_0130",
+        "38.5816_-121.4944_2024-01-15_0131",
+    ]
+
+
+def test_parse_csv_data_needs_coordinate_columns(fetch_fires):
+    module, _ = fetch_fires
+
+    assert list(module.parse_csv_data(["acq_date,acq_time", "2024-01-15,0130"])) == []
+    assert list(module.parse_csv_data([])) == []
+
+
+def test_send_to_queue_counts_only_queued_fires(fetch_fires):
+    module, clients = fetch_fires
+    calls = []
+
+    # Second request raises; in the others the last entry is rejected
+    def send_message_batch(QueueUrl, Entries):
+        calls.append(Entries)
+        if len(calls) == 2:
+            raise RuntimeError("connection reset")
+        return {
+            "Successful": [{"Id": entry["Id"], "MessageId": f"m{entry['Id']}"} for entry in Entries[:-1]],
+            "Failed": [{"Id": Entries[-1]["Id"], "Code": "InternalError", "SenderFault": False}],
+        }
+
+    clients["sqs"].send_message_batch.side_effect = send_message_batch
+    fires = ({"latitude": index, "longitude": index} for index in range(205))
+
+    total_count, sent_count = module.send_to_queue(fires, max_workers=1)
+
+    # 21 messages in 3 requests: 10 + 10 (lost) + 1 (rejected)
+    assert [len(entries) for entries in calls] == [10, 10, 1]
+    assert json.loads(calls[2][0]["MessageBody"])["batch_id"] == "batch_20"
+    assert (total_count, sent_count) == (205, 90)
+
+
+def test_fetch_and_queue_reports_each_source(fetch_fires, monkeypatch):
+    module, _ = fetch_fires
+
+    def fetch_firms_data(map_key, source):
+        if source == "MODIS_NRT":
+            raise RuntimeError("FIRMS request failed with HTTP 500")
+        return [{"latitude": 1.0, "longitude": 2.0}] * 3
+
+    monkeypatch.setattr(module, "fetch_firms_data", fetch_firms_data)
+    monkeypatch.setattr(module, "send_to_queue", lambda fires, batch_prefix: (len(fires), len(fires) - 1))
+
+    assert module.fetch_and_queue("key", ["VIIRS_SNPP_NRT", "MODIS_NRT"]) == {
+        "VIIRS_SNPP_NRT": {"fires_found": 3, "fires_queued": 2},
+        "MODIS_NRT": {"error": "FIRMS request failed with HTTP 500"},
+    }
+    with pytest.raises(ValueError):
+        module.fetch_and_queue("key", [])
@@ -1,15 +1,106 @@
 import aws_cdk as core
 import aws_cdk.assertions as assertions
+import pytest
 
 from firewatch.firewatch_stack import FirewatchStack
 
-# example tests. To run these tests, uncomment this file along with the example
-# resource in firewatch/firewatch_stack.py
-def test_sqs_queue_created():
-    app = core.App()
+# Skip Docker bundling of the dependencies layer when synthesizing in tests
+NO_BUNDLING = {"aws:cdk:bundling-stacks": []}
+
+
+@pytest.fixture(scope="module")
+def template():
+    app = core.App(context=NO_BUNDLING)
     stack = FirewatchStack(app, "firewatch")
-    template = assertions.Template.from_stack(stack)
+    return assertions.Template.from_stack(stack)
+
+
+def test_sqs_queue_created(template):
+    template.has_resource_properties("AWS::SQS::Queue", {
+        "QueueName": "firewatch-data-queue",
+        "VisibilityTimeout": 360,
+    })
+
+
+def test_lambda_aliases_have_provisioned_concurrency(template):
+    # Fetch alias is fixed; the process alias is left to its scaling target
+    template.resource_properties_count_is("AWS::Lambda::Alias", {
+        "Name": "live",
+        "ProvisionedConcurrencyConfig": {"ProvisionedConcurrentExecutions": 1},
+    }, 1)
+    template.has_resource_properties("AWS::ApplicationAutoScaling::ScalableTarget", {
+        "ScalableDimension": "lambda:function:ProvisionedConcurrency",
+        "MinCapacity": 1,
+        "MaxCapacity": 10,
+    })
+
+
+def test_process_concurrency_steps_on_queue_depth(template):
+    # One policy below the 10-25 message band, one above it
+    template.resource_properties_count_is("AWS::ApplicationAutoScaling::ScalingPolicy", {
+        "PolicyType": "StepScaling",
+        "StepScalingPolicyConfiguration": assertions.Match.object_like({
+            "AdjustmentType": "ExactCapacity",
+            "MetricAggregationType": "Maximum",
+        }),
+    }, 2)
+    template.has_resource_properties("AWS::CloudWatch::Alarm", {
+        "MetricName": "ApproximateNumberOfMessagesVisible",
+        "ComparisonOperator": "GreaterThanOrEqualToThreshold",
+        "Threshold": 25,
+    })
+
+
+def test_fetch_lambda_runs_outside_vpc(template):
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "FunctionName": "firewatch-fetch-fires-api",
+        "VpcConfig": assertions.Match.absent(),
+    })
+
+
+def test_process_lambda_sqs_batching(template):
+    template.has_resource_properties("AWS::Lambda::EventSourceMapping", {
+        "BatchSize": 25,
+        "MaximumBatchingWindowInSeconds": 20,
+        "FunctionResponseTypes": ["ReportBatchItemFailures"],
+    })
+
+
+def test_only_gateway_vpc_endpoints(template):
+    template.resource_properties_count_is("AWS::EC2::VPCEndpoint", {
+        "VpcEndpointType": "Interface",
+    }, 0)
+
+
+def test_lambdas_run_on_arm64(template):
+    template.resource_properties_count_is("AWS::Lambda::Function", {
+        "Runtime": "python3.12",
+        "Architectures": ["arm64"],
+    }, 3)
+
+
+def test_lambdas_share_dependencies_layer(template):
+    template.resource_count_is("AWS::Lambda::LayerVersion", 1)
+    template.resource_properties_count_is("AWS::Lambda::Function", {
+        "Layers": assertions.Match.array_with([assertions.Match.any_value()]),
+    }, 3)
+
+
+def test_stream_lambda_only_receives_inserts(template):
+    template.has_resource_properties("AWS::Lambda::EventSourceMapping", {
+        "StartingPosition": "LATEST",
+        "MaximumBatchingWindowInSeconds": 10,
+        "FilterCriteria": {
+            "Filters": [{"Pattern": '{"eventName":["INSERT"]}'}],
+        },
+    })
+
 
-#     template.has_resource_properties("AWS::SQS::Queue", {
-#         "VisibilityTimeout": 300
-#     })
+def test_lambdas_log_json(template):
+    template.resource_properties_count_is("AWS::Lambda::Function", {
+        "LoggingConfig": {
+            "LogFormat": "JSON",
+            "ApplicationLogLevel": "INFO",
+            "SystemLogLevel": "WARN",
+        },
+    }, 3)
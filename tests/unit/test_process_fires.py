@@ -0,0 +1,173 @@
+import json
+from decimal import Decimal
+from unittest import mock
+
+import pytest
+
+LOCATION = {
+    "city": "Los Angeles",
+    "locality": "Los Angeles",
+    "countryName": "United States of America (the)",
+    "principalSubdivision": "California",
+}
+
+
+def sqs_record(message_id, fires):
+    return {
+        "messageId": message_id,
+        "body": json.dumps({
+            "fires": fires,
+            "batch_id": f"VIIRS_SNPP_NRT_{message_id}",
+            "timestamp": "2024-01-15T01:45:00",
+        }),
+    }
+
+
+def fire(latitude, longitude, acq_time="0130"):
+    return {
+        "latitude": latitude,
+        "longitude": longitude,
+        "brightness": 330.5,
+        "confidence": "n",
+        "frp": 12.3,
+        "acq_date": "2024-01-15",
+        "acq_time": acq_time,
+        "satellite": "N",
+        "instrument": "VIIRS",
+        "daynight": "N",
+        "fire_id": f"{latitude}_{longitude}_2024-01-15_{acq_time}",
+    }
+
+
+def fire_item(module, latitude, longitude):
+    # Numbers arrive as Decimal, as parsed from the SQS body
+    return module.serialize_item(module.build_fire_item(
+        json.loads(json.dumps(fire(latitude, longitude)), parse_float=Decimal), 0, "2024-01-15T01:45:00"
+    ))
+
+
+@pytest.fixture
+def process_fires(load_handler, monkeypatch):
+    module, clients = load_handler("process_fires")
+    monkeypatch.setattr(module, "get_location_from_coordinates", lambda latitude, longitude: LOCATION)
+    clients["dynamodb"].batch_write_item.return_value = {"UnprocessedItems": {}}
+    return module, clients
+
+
+@pytest.mark.parametrize("poisoned_fire", [
+    {"latitude": "north", "longitude": -118.2437},
+    {"latitude": None, "longitude": -118.2437},
+    "34.0522,-118.2437",
+])
+def test_poisoned_message_fails_alone(process_fires, poisoned_fire):
+    module, clients = process_fires
+
+    response = module.lambda_handler({"Records": [
+        sqs_record("good", [fire(34.0522, -118.2437)]),
+        sqs_record("poisoned", [fire(36.7783, -119.4179), poisoned_fire]),
+    ]}, None)
+
+    assert response["batchItemFailures"] == [{"itemIdentifier": "poisoned"}]
+    (call,) = clients["dynamodb"].batch_write_item.call_args_list
+    written = call.kwargs["RequestItems"]["firewatch-data"]
+    assert [request["PutRequest"]["Item"]["fire_id"]["S"] for request in written] == [
+        "34.0522_-118.2437_2024-01-15_0130",
+    ]
+
+
+def test_unwritten_fire_fails_only_its_messages(process_fires, monkeypatch):
+    module, clients = process_fires
+    monkeypatch.setattr(module.time, "sleep", lambda seconds: None)
+
+    # DynamoDB never accepts the Sacramento fire
+    def batch_write_item(RequestItems):
+        unprocessed = [
+            request for request in RequestItems["firewatch-data"]
+            if request["PutRequest"]["Item"]["fire_id"]["S"].startswith("38.58")
+        ]
+        return {"UnprocessedItems": {"firewatch-data": unprocessed} if unprocessed else {}}
+
+    clients["dynamodb"].batch_write_item.side_effect = batch_write_item
+
+    response = module.lambda_handler({"Records": [
+        sqs_record("a", [fire(34.0522, -118.2437), fire(38.5816, -121.4944)]),
+        sqs_record("b", [fire(38.5816, -121.4944)]),
+        sqs_record("c", [fire(36.7783, -119.4179)]),
+    ]}, None)
+
+    assert response["statusCode"] == 207
+    assert sorted(failure["itemIdentifier"] for failure in response["batchItemFailures"]) == ["a", "b"]
+
+
+def test_write_fire_items_retries_unprocessed_items(process_fires, monkeypatch):
+    module, clients = process_fires
+    monkeypatch.setattr(module.time, "sleep", lambda seconds: None)
+    items = [fire_item(module, 34.0522, -118.2437 + index) for index in range(3)]
+    throttled = [{"PutRequest": {"Item": items[1]}}]
+    clients["dynamodb"].batch_write_item.side_effect = [
+        {"UnprocessedItems": {"firewatch-data": throttled}},
+        {"UnprocessedItems": {}},
+    ]
+
+    assert module.write_fire_items(items) == []
+    retry = clients["dynamodb"].batch_write_item.call_args_list[1]
+    assert retry.kwargs["RequestItems"] == {"firewatch-data": throttled}
+
+
+def test_write_fire_items_reports_items_left_unprocessed(process_fires, monkeypatch):
+    module, clients = process_fires
+    monkeypatch.setattr(module.time, "sleep", lambda seconds: None)
+    items = [fire_item(module, 34.0522, -118.2437 + index) for index in range(30)]
+    stuck = {"PutRequest": {"Item": items[27]}}
+    clients["dynamodb"].batch_write_item.side_effect = lambda RequestItems: {
+        "UnprocessedItems": {
+            "firewatch-data": [request for request in RequestItems["firewatch-data"] if request == stuck],
+        },
+    }
+
+    assert module.write_fire_items(items) == [items[27]["fire_id"]["S"]]
+    # First 25-item chunk once, then every attempt at the second chunk
+    assert clients["dynamodb"].batch_write_item.call_count == 1 + module.BATCH_WRITE_ATTEMPTS
+
+
+def test_write_fire_items_stops_on_non_retryable_error(process_fires):
+    module, clients = process_fires
+    items = [fire_item(module, 34.0522, -118.2437)]
+    clients["dynamodb"].batch_write_item.side_effect = module.ClientError(
+        {"Error": {"Code": "ValidationException", "Message": "bad item"}}, "BatchWriteItem"
+    )
+
+    assert module.write_fire_items(items) == ["34.0522_-118.2437_2024-01-15_0130"]
+    assert clients["dynamodb"].batch_write_item.call_count == 1
+
+
+def test_geocode_cached_keeps_only_stored_fields(process_fires, monkeypatch):
+    module, _ = process_fires
+    http = mock.MagicMock()
+    http.request.return_value.status = 200
+    http.request.return_value.data = json.dumps(dict(
+        LOCATION,
+        countryCode="US",
+        localityInfo={"administrative": [{"name": "California", "order": 5}], "informative": []},
+    )).encode()
+    monkeypatch.setattr(module, "http", http)
+
+    assert module.geocode_cached(34.05, -118.24) == LOCATION
+
+
+@pytest.mark.parametrize("field, literal", [("frp", "NaN"), ("brightness", "1e400")])
+def test_unstorable_number_fails_only_its_message(process_fires, field, literal):
+    module, clients = process_fires
+    poisoned = sqs_record("poisoned", [dict(fire(36.7783, -119.4179), **{field: "UNSTORABLE"})])
+    # Literals json.dumps won't write: NaN as sent by the stdlib encoder,
+    # and a number beyond DynamoDB's range
+    poisoned["body"] = poisoned["body"].replace('"UNSTORABLE"', literal)
+
+    response = module.lambda_handler({"Records": [
+        sqs_record("good", [fire(34.0522, -118.2437)]),
+        poisoned,
+    ]}, None)
+
+    assert response["batchItemFailures"] == [{"itemIdentifier": "poisoned"}]
+    (call,) = clients["dynamodb"].batch_write_item.call_args_list
+    assert len(call.kwargs["RequestItems"]["firewatch-data"]) == 1
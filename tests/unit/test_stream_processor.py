@@ -0,0 +1,111 @@
+import json
+import logging
+
+import pytest
+
+
+def insert_record(country, city="Unknown"):
+    return {
+        "eventName": "INSERT",
+        "dynamodb": {
+            "NewImage": {
+                "latitude": {"N": "51.5072"},
+                "longitude": {"N": "-0.1276"},
+                "confidence": {"S": "n"},
+                "frp": {"N": "12.3"},
+                "location_city": {"S": city},
+                "location_country": {"S": country},
+            },
+        },
+    }
+
+
+def entry(index):
+    return {"Id": str(index), "Subject": "Firewatch Alert", "Message": "New fires"}
+
+
+@pytest.fixture
+def stream_processor(load_handler, monkeypatch):
+    module, clients = load_handler("stream_processor")
+    monkeypatch.setattr(module.time, "sleep", lambda seconds: None)
+    return module, clients
+
+
+def test_publish_alerts_retries_service_faults(stream_processor):
+    module, clients = stream_processor
+    clients["sns"].publish_batch.side_effect = [
+        {
+            "Successful": [{"Id": "0"}],
+            "Failed": [{"Id": "1", "Code": "InternalError", "SenderFault": False}],
+        },
+        {"Successful": [{"Id": "1"}], "Failed": []},
+    ]
+
+    assert module.publish_alerts([entry(0), entry(1)]) == (2, 0)
+    retry = clients["sns"].publish_batch.call_args_list[1]
+    assert [item["Id"] for item in retry.kwargs["PublishBatchRequestEntries"]] == ["1"]
+
+
+def test_publish_alerts_drops_sender_faults(stream_processor):
+    module, clients = stream_processor
+    clients["sns"].publish_batch.return_value = {
+        "Successful": [{"Id": "0"}],
+        "Failed": [{"Id": "1", "Code": "InvalidParameter", "SenderFault": True}],
+    }
+
+    assert module.publish_alerts([entry(0), entry(1)]) == (1, 1)
+    assert clients["sns"].publish_batch.call_count == 1
+
+
+def test_publish_alerts_raises_after_last_attempt(stream_processor):
+    module, clients = stream_processor
+    clients["sns"].publish_batch.return_value = {
+        "Successful": [],
+        "Failed": [{"Id": "0", "Code": "InternalError", "SenderFault": False}],
+    }
+
+    with pytest.raises(RuntimeError):
+        module.publish_alerts([entry(0)])
+    assert clients["sns"].publish_batch.call_count == module.PUBLISH_ATTEMPTS
+
+
+def test_alert_subjects_fit_sns_limit(stream_processor):
+    module, clients = stream_processor
+    clients["sns"].publish_batch.side_effect = lambda TopicArn, PublishBatchRequestEntries: {
+        "Successful": [{"Id": item["Id"]} for item in PublishBatchRequestEntries],
+        "Failed": [],
+    }
+
+    response = module.lambda_handler({"Records": [
+        insert_record("United Kingdom of Great Britain and Northern Ireland (the)", "London"),
+        insert_record("Canada"),
+    ]}, None)
+
+    assert json.loads(response["body"])["alerts_dropped"] == 0
+    (call,) = clients["sns"].publish_batch.call_args_list
+    entries = call.kwargs["PublishBatchRequestEntries"]
+    assert [item["MessageAttributes"]["countries"]["StringValue"] for item in entries] == [
+        "Canada",
+        "United Kingdom of Great Britain and Northern Ireland (the)",
+    ]
+    assert all(len(item["Subject"]) < 100 for item in entries)
+
+
+@pytest.mark.parametrize("module_name", ["fetch_fires", "process_fires", "stream_processor"])
+def test_handlers_accept_trace_log_level(load_handler, monkeypatch, module_name):
+    # TRACE is a valid Lambda application log level but not a stdlib one
+    monkeypatch.setenv("AWS_LAMBDA_LOG_LEVEL", "TRACE")
+
+    module, _ = load_handler(module_name)
+
+    assert module.logger.level == logging.DEBUG
+
+
+def test_parse_alert_fire_defaults_mistyped_attributes(stream_processor):
+    module, _ = stream_processor
+    image = insert_record("Canada", "Kelowna")["dynamodb"]["NewImage"]
+    image.update(confidence={"NULL": True}, frp={"S": "12.3"}, location_state={"NULL": True})
+
+    assert module.parse_alert_fire(image) == (
+        "Canada", "Kelowna", "Unknown", 51.5072, -0.1276, "unknown", 0.0,
+    )